@@ -6,24 +6,36 @@ from typing import Iterable
 from nltk.tokenize.treebank import TreebankWordDetokenizer
 from nltk.corpus import wordnet
 from collections import defaultdict
-from threading import Lock
+import heapq
+from functools import partial
 import nltk
 
 class WordData:
 	""" Class for storing data on words and the files and sentences they were found in. """
 
+	DETOKENIZER = TreebankWordDetokenizer()
+	""" Shared detokenizer used to rebuild sentences from their words when printing results. """
+
+	PROPER_NOUN_TYPES = frozenset({'NNP', 'NNPS'})
+	""" pos tags of words that keep their case when added to data. """
+
+	lemma_cache = {}
+	""" Maps (word, pos) tuples to their lemmas, shared by all instances so each word form is only looked up in wordnet once. """
+
 	def __init__(self, lemmatize=False):
 		"""
-		param lemmatize: Determines whether words should be lemmatized before being added to data. 
+		param lemmatize: Determines whether words should be lemmatized before being added to data. \
+			Requires the nltk wordnet corpus to have been downloaded.
 		"""
-		self.data = defaultdict(lambda: defaultdict(list))
-		if lemmatize:
-			nltk.download('wordnet')
+		# partial rather than lambda so that data can be pickled and sent between processes
+		self.data = defaultdict(partial(defaultdict, list))
+		self.counts = defaultdict(partial(defaultdict, int)) # {(word, pos): {file: count}}
+		self.totals = defaultdict(int) # {(word, pos): count}
+		self.lowered = {} # {(word, pos): word.lower()}, computed once per word for sorting results
 		self.lemmatizer = nltk.stem.WordNetLemmatizer() if lemmatize else None
-		self.lock = Lock()
 
 
-	def add(self, word_pos, file, sentence_pos):
+	def add(self, word_pos, file, sentence_pos, multiplicity=1):
 		"""
 		Adds occurence of word to data, including information on 
 		the file and sentence that the word occured in.
@@ -32,13 +44,41 @@ class WordData:
 			word_pos: The (word, pos) tuple to add to data.
 			file: The file the word was found in.
 			sentence_pos: The full sentence the word occured in, split in to an array of (word, pos_tags) tuples.
+			multiplicity: The number of times the word occurs in the sentence.
 		"""
-		with self.lock:
-			if self.lemmatizer is not None:
-				lemmatized_word = self.lemmatizer.lemmatize(word_pos[0], pos=WordData.get_wordnet_pos(word_pos[1]))
-				word_pos = (lemmatized_word, word_pos[1])
-			
-			self.data[word_pos][file].append(sentence_pos)
+		if self.lemmatizer is not None:
+			word_pos = (self.lemmatize(*word_pos), word_pos[1])
+		
+		sentences = self.data[word_pos][file]
+		# Different forms of a word (e.g. "Word" and "word") can map to the same entry, so only store each sentence once.
+		if not sentences or sentences[-1] is not sentence_pos:
+			sentences.append(sentence_pos)
+		self.counts[word_pos][file] += multiplicity
+		total = self.totals.get(word_pos)
+		if total is None:
+			self.lowered[word_pos] = word_pos[0].lower()
+			total = 0
+		self.totals[word_pos] = total + multiplicity
+
+
+	def merge(self, other):
+		"""
+		Adds all word data from another WordData object to this one.
+
+		Args:
+			other: The WordData object to merge in to this one. It should have been created with the same lemmatize setting.
+		"""
+		for word_pos, occurences in other.data.items():
+			files = self.data[word_pos]
+			for file, sentences in occurences.items():
+				files[file].extend(sentences)
+		for word_pos, file_counts in other.counts.items():
+			counts = self.counts[word_pos]
+			for file, count in file_counts.items():
+				counts[file] += count
+		for word_pos, total in other.totals.items():
+			self.totals[word_pos] += total
+		self.lowered.update(other.lowered)
 
 
 	def get_count(self, word_pos, file=None):
@@ -49,18 +89,9 @@ class WordData:
 		Returns:
 			The total number of occurences of a particular word in the data.
 		"""
-		count = 0
-		# Get list of sentences word appears in
-		if file is not None:
-			sentences = self.data.get(word_pos).get(file)
-		else:
-			sentences = (sentence for f in self.data.get(word_pos).values() for sentence in f)
-		# Check how many times word appears in each sentence
-		for sentence_pos in sentences:
-			for wp in sentence_pos:
-				if self.is_equivalent(word_pos, wp):
-					count += 1
-		return count
+		if file is None:
+			return self.totals.get(word_pos, 0)
+		return self.counts.get(word_pos, {}).get(file, 0)
 
 
 	def generate_results(self, min_count=None, sort_by=None):
@@ -74,11 +105,11 @@ class WordData:
 			sort_by: Parameter to pass to 'key' argument of :py:func:`list.sort` function. \
 				Use if results should be generated in a particular order.
 		"""
-		words_pos_list = list(self.data.keys())
+		words_pos_list = list(self.data)
 		if sort_by:
 			words_pos_list.sort(key=sort_by)
 		for word_pos in words_pos_list:
-			if min_count is None or self.get_count(word_pos) >= min_count:
+			if min_count is None or self.totals[word_pos] >= min_count:
 				yield (word_pos, self.data[word_pos])
 
 
@@ -94,24 +125,27 @@ class WordData:
 				is a word followed by its dictionary of occurrences.
 		"""
 		n = n or len(self.data)
+		if sort_by and n < len(self.data):
+			# Only the first n words are needed, so select them with a heap instead of sorting every word.
+			words_pos_iter = (wp for wp in self.data if min_count is None or self.totals[wp] >= min_count)
+			return ((word_pos, self.data[word_pos]) for word_pos in heapq.nsmallest(n, words_pos_iter, key=sort_by))
 		results_iter = self.generate_results(min_count=min_count, sort_by=sort_by)
 		return islice(results_iter, 0 , n)
 
 
-	def is_equivalent(self, word_pos, word_pos_in_sentence):
-		""" 
-		Returns True if a word in the context of a sentence is counted as being the same as word, accounting for potential lemmatisation.
-		
+	def lemmatize(self, word, pos):
+		"""
+		Returns the lemma of a word, using cached results for word forms that have already been lemmatized.
+
 		Args:
-			word_pos: The (word, pos) tuple as it appears as a key in the self.data dict.
-			word_pos_in_sentence: The (word, pos) tuple as it appears in the context of a full sentence.
+			word: The word to lemmatize.
+			pos: The nltk pos tag of the word.
 		"""
-		w, p = word_pos_in_sentence
-		if p not in ('NNP', 'NNPS') and w[0].isupper():
-			w = w.lower()
-		if self.lemmatizer is not None:
-			w = self.lemmatizer.lemmatize(w, pos=WordData.get_wordnet_pos(p))
-		return word_pos[0] == w and word_pos[1] == p
+		lemma = WordData.lemma_cache.get((word, pos))
+		if lemma is None:
+			lemma = self.lemmatizer.lemmatize(word, pos=WordData.get_wordnet_pos(pos))
+			WordData.lemma_cache[(word, pos)] = lemma
+		return lemma
 
 
 	def print_results(self, results: Iterable, include_sentences=True, file=None):
@@ -129,19 +163,24 @@ class WordData:
 			file: If not None, print results to output file with this name. Else print to console.
 		"""
 		output_lines = ["Results: ", ""]
+		filenames = {} # {filepath: filename}, so each path is only split once
+		file_info_end = ' [' if include_sentences else ','
 		for rank, (word_pos, occurences) in enumerate(results):
-			word_info = f"{rank + 1} - {word_pos[0]} ({self.get_count(word_pos)})"
+			word_info = f"{rank + 1} - {word_pos[0]} ({self.totals[word_pos]})"
 			output_lines.append(f'{word_info} {{')
+			file_counts = self.counts[word_pos]
 			# Print file names that word occured in 
-			for filepath in occurences.keys():
-				filename = path.split(filepath)[-1]
-				file_info = f'\t{filename} ({self.get_count(word_pos, file=filepath)})' + (' [' if include_sentences else ',')
+			for filepath, sentences in occurences.items():
+				filename = filenames.get(filepath)
+				if filename is None:
+					filename = filenames[filepath] = path.basename(filepath)
+				file_info = f'\t{filename} ({file_counts[filepath]})' + file_info_end
 				output_lines.append(file_info)
 				# Print sentences that word occured in
 				if include_sentences:
-					for sentence in occurences[filepath]:
+					for sentence in sentences:
 						words = [wp[0] for wp in sentence]
-						sentence = TreebankWordDetokenizer().detokenize(words)
+						sentence = WordData.DETOKENIZER.detokenize(words)
 						output_lines.append(f'\t\t"{sentence}",')
 					output_lines.append('\t]')
 			output_lines.append('}')
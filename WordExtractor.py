@@ -1,5 +1,10 @@
 # Author: Sam Bradshaw
 
+from collections import Counter
+from functools import lru_cache
+import sys
+from nltk.tag import PerceptronTagger
+from nltk.tokenize import NLTKWordTokenizer
 from WordData import WordData
 import nltk
 
@@ -8,10 +13,10 @@ class WordExtractor:
 	Class for reading text from a file and extracting interesting words and information on where they occured. 
 	"""
 
-	STOP_WORDS = set(nltk.corpus.stopwords.words('english')) 
+	STOP_WORDS = frozenset(nltk.corpus.stopwords.words('english'))
 	""" Set of commonly used words in English language. """
 	
-	interesting_types = { 
+	interesting_types = frozenset({ 
 		'NN', # nouns
 		'NNS', # nouns (plural)
 		'NNP', # proper nouns (singular)
@@ -21,9 +26,25 @@ class WordExtractor:
 		'JJS', # adjectives (superlative)
 		'CD', # numerical 
 		'FW' # foreign words
-	}
+	})
 	""" Types of words to include. See nltk documentation for pos tagging. Run nltk.help.upenn_tagset() to see full list of nltk pos tags. """
 
+	sentence_tokenizer = None
+	""" Shared pretrained punkt sentence tokenizer, loaded once by load_nltk_models() rather than on every call to nltk.sent_tokenize. """
+
+	word_tokenizer = NLTKWordTokenizer()
+	""" Shared word tokenizer, the same one used by nltk.word_tokenize. """
+
+	tagger = None
+	""" Shared pos tagger, loaded once by load_nltk_models() rather than on every call to nltk.pos_tag. """
+
+	word_pos_cache = {}
+	""" 
+	Maps each (word, pos) tuple seen to a single shared instance, so sentences from the same process reference 
+	shared tuples rather than a new tuple for every token. Each sentence is still its own list with one entry per token. 
+	The cache is never cleared, so it grows with the vocabulary seen for the life of the process.
+	"""
+
 
 	def __init__(self, filepath, encoding=None):
 		"""
@@ -41,25 +62,46 @@ class WordExtractor:
 		Args:
 			data: WordData object to add word data to.
 		"""
+		proper_noun_types = WordData.PROPER_NOUN_TYPES
 		with open(self.filepath, encoding=self.encoding) as file:
-			for line in file:
-				for sentence in nltk.tokenize.sent_tokenize(line):
-					words = nltk.word_tokenize(sentence)
-					word_pos_tuples = nltk.pos_tag(words) # pos = part-of-speech
-					for word_pos in set(word_pos_tuples): # Convert to set so if same word appears twice in same sentence it is not duplicated in data.
-						word, pos = word_pos
-						if pos not in ('NNP','NNPS') and word[0].isupper():
-							# convert to lower case if word is not a proper noun.
-							word_pos = (word.lower(), pos)
-						if WordExtractor.is_interesting(word_pos):
-							if not pos.startswith('V') or "'" not in word: # Filter out abbreviated verbs 
-								data.add(word_pos, file.name, word_pos_tuples)
+			# Tokenize the whole text at once so sentences that span multiple lines are kept together.
+			for sentence in WordExtractor.sentence_tokenizer.tokenize(file.read()):
+				# Copied to a new list so that WordData can tell repeated occurences of the same sentence apart.
+				word_pos_tuples = list(WordExtractor.tag_sentence(sentence)) # pos = part-of-speech
+				# Convert to lower case any word that is not a proper noun, so different cases of a word are counted together.
+				# Words starting with an ascii lower case letter (the common case) skip the unicode isupper check.
+				# pos tags come from a small fixed set, so interning them makes key comparisons cheap.
+				canonical = Counter(
+					(word.lower() if pos not in proper_noun_types and not 'a' <= word[0] <= 'z' and word[0].isupper() else word, sys.intern(pos))
+					for word, pos in word_pos_tuples
+				)
+				for word_pos, multiplicity in canonical.items(): # Counted so if same word appears twice in same sentence it is not duplicated in data.
+					word, pos = word_pos
+					if pos.startswith('V') and "'" in word: # Filter out abbreviated verbs
+						continue
+					if WordExtractor.is_interesting(word_pos):
+						data.add(word_pos, file.name, word_pos_tuples, multiplicity)
+
+
+	@staticmethod
+	@lru_cache(maxsize=200_000)
+	def tag_sentence(sentence):
+		"""
+		Splits a sentence into words and tags each word with its part of speech. Results are cached, 
+		as texts often repeat sentences (e.g. headers and footers).
+
+		Returns:
+			A tuple of (word, pos) tuples.
+		"""
+		word_pos_cache = WordExtractor.word_pos_cache
+		words = WordExtractor.word_tokenizer.tokenize(sentence)
+		return tuple(word_pos_cache.setdefault(wp, wp) for wp in WordExtractor.tagger.tag(words))
 
 
 	@staticmethod
 	def set_interesting_types(word_types):
 		""" 
-		Updates the WordExtractor.interesting_types static variable set.
+		Updates the WordExtractor.interesting_types static variable frozenset.
 		
 		Raises:
 			ValueError if entry in word_types is not "nouns", "verbs", or "adjectives"
@@ -75,15 +117,30 @@ class WordExtractor:
 				interesting.update({'VB', 'VBD', 'VBG', 'VBN', 'VBP', 'VBZ'})
 			elif type == "adjectives":
 				interesting.update({'JJ', 'JJR', 'JJS'})
-		WordExtractor.interesting_types = interesting
+		WordExtractor.interesting_types = frozenset(interesting)
 
 
 	@staticmethod
-	def download_nltk_libraries():
-		""" Download required nltk libraries. This method must be run before any instances of WordExtractor class are substatiated. """
+	def download_nltk_libraries(lemmatize=False):
+		""" 
+		Download required nltk libraries. This method must be run before any instances of WordExtractor class are substatiated. 
+		
+		Args:
+			lemmatize: If True, also download the wordnet corpus required to lemmatize words in WordData.
+		"""
 		nltk.download('punkt') 
 		nltk.download('stopwords')
 		nltk.download('averaged_perceptron_tagger')
+		if lemmatize:
+			nltk.download('wordnet')
+		WordExtractor.load_nltk_models()
+
+
+	@staticmethod
+	def load_nltk_models():
+		""" Load the nltk models shared by all instances of WordExtractor. Requires nltk libraries to have been downloaded. """
+		WordExtractor.sentence_tokenizer = nltk.data.load('tokenizers/punkt/english.pickle')
+		WordExtractor.tagger = PerceptronTagger()
 
 
 	@staticmethod
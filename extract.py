@@ -1,7 +1,8 @@
 # Author: Sam Bradshaw
 # 25/10/2021
 # Developed using python 3.10
-from threading import Thread
+from multiprocessing import Pool
+from functools import partial
 import os
 import getopt
 import time
@@ -23,6 +24,9 @@ OPTIONS = {
 } 
 """ Set of command line options"""
 
+OPTION_BY_NAME = {name: o for o in OPTIONS for name in (o.short, o.long)}
+""" Command line options keyed by both their long and short names """
+
 
 def extract_word_data(input_files, file=None, num=15, omit_sentences=False, all=False, min_count=None, interested_in=None, lemmatize=False):
 	"""
@@ -45,32 +49,60 @@ def extract_word_data(input_files, file=None, num=15, omit_sentences=False, all=
 		except ValueError as e:
 			print(f'Error: invalid value specified for --interesting option. {e}')
 			print_help_and_exit(1)
-	WordExtractor.download_nltk_libraries()
+	WordExtractor.download_nltk_libraries(lemmatize)
 	
-	# Extract word data from files
+	# Extract word data from files in separate processes, then merge results
 	word_data = WordData(lemmatize)
 
-	threads = []
-	for input_file in input_files:
-		thread = Thread(target=extract_file, args=(word_data, input_file))
-		#extract_file(word_data, input_file)
-		thread.start()
-		threads.append(thread)
-	
-	for thread in threads:
-		thread.join()
+	extract = partial(extract_file, lemmatize=lemmatize)
+	if len(input_files) > 1:
+		processes = min(len(input_files), os.cpu_count() or 1)
+		with Pool(processes, initializer=init_worker, initargs=(WordExtractor.interesting_types,)) as pool:
+			merge_file_data(word_data, pool.imap(extract, input_files))
+	else:
+		# A single file gains nothing from a worker process, which would have to load its own nltk models
+		merge_file_data(word_data, map(extract, input_files))
 	
 	# Retrieve word results in descending order of total number of occurences in all files
 	if all is True: num = None
-	count_desc_alphabetical = lambda word_pos: (-word_data.get_count(word_pos), word_pos[0].lower())
+	count_desc_alphabetical = lambda word_pos: (-word_data.totals[word_pos], word_data.lowered[word_pos])
 	results = word_data.get_results(n=num, min_count=min_count, sort_by=count_desc_alphabetical)
 	word_data.print_results(results, not omit_sentences, file=file)
 
 
-def extract_file(word_data: WordData, input_file):
+def init_worker(interesting_types):
+	"""
+	Prepares a worker process for extracting word data. Worker processes may not inherit state 
+	from the main process, so the interesting types are passed in and the nltk models are loaded here.
+	"""
+	WordExtractor.interesting_types = interesting_types
+	if WordExtractor.tagger is None:
+		WordExtractor.load_nltk_models()
+
+
+def extract_file(input_file, lemmatize=False):
+	"""
+	Returns a new WordData object containing the word data extracted from input_file, 
+	or None if the file could not be read.
+	"""
+	word_data = WordData(lemmatize)
 	we = WordExtractor(input_file)
 	print(f"Extracting word data from {input_file}...")
-	we.extract_words(word_data)
+	try:
+		we.extract_words(word_data)
+	except (OSError, UnicodeDecodeError) as e:
+		print(f"Warning: skipping {input_file} as it could not be read. {e}")
+		return None
+	return word_data
+
+
+def merge_file_data(word_data: WordData, file_data_iter):
+	"""
+	Merges WordData objects returned by extract_file in to word_data, skipping files that could not be read.
+	"""
+	for file_data in file_data_iter:
+		if file_data is not None:
+			word_data.merge(file_data)
 	
 
 def get_files(dir):
@@ -127,9 +159,9 @@ def extract_args(optlist: tuple):
 		elif opt in ('lemmatize', 'l'):
 			args['lemmatize'] = True
 		else:
-			for valid_option in OPTIONS:
-				if opt == valid_option:
-					args[valid_option.long] = int(value) if value.isdigit() else value
+			valid_option = OPTION_BY_NAME.get(opt)
+			if valid_option is not None:
+				args[valid_option.long] = int(value) if value.isdigit() else value
 	if interesting_types:
 		args['interested_in'] = interesting_types
 	return args